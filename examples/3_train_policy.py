@@ -21,6 +21,7 @@ output_directory.mkdir(parents=True, exist_ok=True)
 training_steps = 5000
 device = torch.device("cuda")
 log_freq = 250
+num_workers = 4
 
 # Set up the dataset.
 delta_timestamps = {
@@ -49,11 +50,13 @@ optimizer = torch.optim.Adam(policy.parameters(), lr=1e-4)
 # Create dataloader for offline training.
 dataloader = torch.utils.data.DataLoader(
     dataset,
-    num_workers=4,
+    num_workers=num_workers,
     batch_size=64,
     shuffle=True,
-    pin_memory=device != torch.device("cpu"),
+    pin_memory=device.type == "cuda",
     drop_last=True,
+    # Keep the worker processes alive between epochs, instead of starting new ones for each pass over the data.
+    persistent_workers=num_workers > 0,
 )
 
 # Run training loop.
@@ -66,7 +69,7 @@ while not done:
         loss = output_dict["loss"]
         loss.backward()
         optimizer.step()
-        optimizer.zero_grad()
+        optimizer.zero_grad(set_to_none=True)
 
         if step % log_freq == 0:
             print(f"step: {step} loss: {loss.item():.3f}")
@@ -70,7 +70,7 @@ val_dataloader = torch.utils.data.DataLoader(
     num_workers=4,
     batch_size=64,
     shuffle=False,
-    pin_memory=device != torch.device("cpu"),
+    pin_memory=device.type == "cuda",
     drop_last=False,
 )
 
@@ -18,8 +18,9 @@ import logging
 import torch
 from omegaconf import ListConfig, OmegaConf
 
-from lerobot.common.datasets.lerobot_dataset import LeRobotDataset, MultiLeRobotDataset
+from lerobot.common.datasets.lerobot_dataset import DATA_DIR, LeRobotDataset, MultiLeRobotDataset
 from lerobot.common.datasets.transforms import get_image_transforms
+from lerobot.common.datasets.utils import get_local_staging_dir, stage_to_local
 
 
 def resolve_delta_timestamps(cfg):
@@ -56,13 +57,11 @@ def make_dataset(cfg, split: str = "train") -> LeRobotDataset | MultiLeRobotData
             "strings to load multiple datasets."
         )
 
+    # A single dataset, or multiple datasets.
+    dataset_repo_ids = [cfg.dataset_repo_id] if isinstance(cfg.dataset_repo_id, str) else cfg.dataset_repo_id
+
     # A soft check to warn if the environment matches the dataset. Don't check if we are using a real world env (dora).
     if cfg.env.name != "dora":
-        if isinstance(cfg.dataset_repo_id, str):
-            dataset_repo_ids = [cfg.dataset_repo_id]  # single dataset
-        else:
-            dataset_repo_ids = cfg.dataset_repo_id  # multiple datasets
-
         for dataset_repo_id in dataset_repo_ids:
             if cfg.env.name not in dataset_repo_id:
                 logging.warning(
@@ -72,6 +71,11 @@ def make_dataset(cfg, split: str = "train") -> LeRobotDataset | MultiLeRobotData
 
     resolve_delta_timestamps(cfg)
 
+    root = DATA_DIR
+    if cfg.training.get("stage_to_local") and DATA_DIR is not None:
+        root = stage_to_local(dataset_repo_ids, DATA_DIR, get_local_staging_dir())
+        logging.info(f"Datasets staged from {DATA_DIR} to {root}.")
+
     image_transforms = None
     if cfg.training.image_transforms.enable:
         cfg_tf = cfg.training.image_transforms
@@ -93,6 +97,7 @@ def make_dataset(cfg, split: str = "train") -> LeRobotDataset | MultiLeRobotData
     if isinstance(cfg.dataset_repo_id, str):
         dataset = LeRobotDataset(
             cfg.dataset_repo_id,
+            root=root,
             split=split,
             delta_timestamps=cfg.training.get("delta_timestamps"),
             image_transforms=image_transforms,
@@ -101,6 +106,7 @@ def make_dataset(cfg, split: str = "train") -> LeRobotDataset | MultiLeRobotData
     else:
         dataset = MultiLeRobotDataset(
             cfg.dataset_repo_id,
+            root=root,
             split=split,
             delta_timestamps=cfg.training.get("delta_timestamps"),
             image_transforms=image_transforms,
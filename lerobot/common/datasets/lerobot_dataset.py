@@ -15,6 +15,7 @@
 # limitations under the License.
 import logging
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import Callable
 
@@ -88,22 +89,26 @@ class LeRobotDataset(torch.utils.data.Dataset):
     def features(self) -> datasets.Features:
         return self.hf_dataset.features
 
-    @property
+    @cached_property
     def camera_keys(self) -> list[str]:
-        """Keys to access image and video stream from cameras."""
+        """Keys to access image and video stream from cameras.
+
+        Note: It is cached as it is used for every item, and the features of the dataset do not change.
+        """
         keys = []
         for key, feats in self.hf_dataset.features.items():
             if isinstance(feats, (datasets.Image, VideoFrame)):
                 keys.append(key)
         return keys
 
-    @property
+    @cached_property
     def video_frame_keys(self) -> list[str]:
         """Keys to access video frames that requires to be decoded into images.
 
         Note: It is empty if the dataset contains images only,
         or equal to `self.cameras` if the dataset contains videos only,
         or can even be a subset of `self.cameras` in a case of a mixed image/video dataset.
+        Like `camera_keys`, it is cached as it is used for every item.
         """
         video_frame_keys = []
         for key, feats in self.hf_dataset.features.items():
@@ -116,9 +121,13 @@ class LeRobotDataset(torch.utils.data.Dataset):
         """Number of samples/frames."""
         return len(self.hf_dataset)
 
-    @property
+    @cached_property
     def num_episodes(self) -> int:
-        """Number of episodes."""
+        """Number of episodes.
+
+        Note: It is cached as it requires a scan of the whole dataset, and it is used every time training
+        progress is logged.
+        """
         return len(self.hf_dataset.unique("episode_index"))
 
     @property
@@ -19,6 +19,7 @@ Contains utilities to process raw data format of HDF5 files like in: https://git
 
 import gc
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import h5py
@@ -80,76 +81,78 @@ def load_from_raw(raw_dir: Path, videos_dir: Path, fps: int, video: bool, episod
 
     ep_dicts = []
     ep_ids = episodes if episodes else range(num_episodes)
-    for ep_idx in tqdm.tqdm(ep_ids):
-        ep_path = hdf5_files[ep_idx]
-        with h5py.File(ep_path, "r") as ep:
-            num_frames = ep["/action"].shape[0]
-
-            # last step of demonstration is considered done
-            done = torch.zeros(num_frames, dtype=torch.bool)
-            done[-1] = True
-
-            state = torch.from_numpy(ep["/observations/qpos"][:])
-            action = torch.from_numpy(ep["/action"][:])
-            if "/observations/qvel" in ep:
-                velocity = torch.from_numpy(ep["/observations/qvel"][:])
-            if "/observations/effort" in ep:
-                effort = torch.from_numpy(ep["/observations/effort"][:])
-
-            ep_dict = {}
-
-            for camera in get_cameras(ep):
-                img_key = f"observation.images.{camera}"
-
-                if compressed_images:
-                    import cv2
-
-                    # load one compressed image after the other in RAM and uncompress
-                    imgs_array = []
-                    for data in ep[f"/observations/images/{camera}"]:
-                        imgs_array.append(cv2.imdecode(data, 1))
-                    imgs_array = np.array(imgs_array)
-
-                else:
-                    # load all images in RAM
-                    imgs_array = ep[f"/observations/images/{camera}"][:]
-
-                if video:
-                    # save png images in temporary directory
-                    tmp_imgs_dir = videos_dir / "tmp_images"
-                    save_images_concurrently(imgs_array, tmp_imgs_dir)
-
-                    # encode images to a mp4 video
-                    fname = f"{img_key}_episode_{ep_idx:06d}.mp4"
-                    video_path = videos_dir / fname
-                    encode_video_frames(tmp_imgs_dir, video_path, fps)
-
-                    # clean temporary images directory
-                    shutil.rmtree(tmp_imgs_dir)
-
-                    # store the reference to the video frame
-                    ep_dict[img_key] = [
-                        {"path": f"videos/{fname}", "timestamp": i / fps} for i in range(num_frames)
-                    ]
-                else:
-                    ep_dict[img_key] = [PILImage.fromarray(x) for x in imgs_array]
-
-            ep_dict["observation.state"] = state
-            if "/observations/velocity" in ep:
-                ep_dict["observation.velocity"] = velocity
-            if "/observations/effort" in ep:
-                ep_dict["observation.effort"] = effort
-            ep_dict["action"] = action
-            ep_dict["episode_index"] = torch.tensor([ep_idx] * num_frames)
-            ep_dict["frame_index"] = torch.arange(0, num_frames, 1)
-            ep_dict["timestamp"] = torch.arange(0, num_frames, 1) / fps
-            ep_dict["next.done"] = done
-            # TODO(rcadene): add reward and success by computing them in sim
-
-            assert isinstance(ep_idx, int)
-            ep_dicts.append(ep_dict)
-
-        gc.collect()
+    # Reuse the same threads to save the images of all the episodes, instead of starting new ones for each.
+    with ThreadPoolExecutor(max_workers=4) as image_writer:
+        for ep_idx in tqdm.tqdm(ep_ids):
+            ep_path = hdf5_files[ep_idx]
+            with h5py.File(ep_path, "r") as ep:
+                num_frames = ep["/action"].shape[0]
+
+                # last step of demonstration is considered done
+                done = torch.zeros(num_frames, dtype=torch.bool)
+                done[-1] = True
+
+                state = torch.from_numpy(ep["/observations/qpos"][:])
+                action = torch.from_numpy(ep["/action"][:])
+                if "/observations/qvel" in ep:
+                    velocity = torch.from_numpy(ep["/observations/qvel"][:])
+                if "/observations/effort" in ep:
+                    effort = torch.from_numpy(ep["/observations/effort"][:])
+
+                ep_dict = {}
+
+                for camera in get_cameras(ep):
+                    img_key = f"observation.images.{camera}"
+
+                    if compressed_images:
+                        import cv2
+
+                        # load one compressed image after the other in RAM and uncompress
+                        imgs_array = []
+                        for data in ep[f"/observations/images/{camera}"]:
+                            imgs_array.append(cv2.imdecode(data, 1))
+                        imgs_array = np.array(imgs_array)
+
+                    else:
+                        # load all images in RAM
+                        imgs_array = ep[f"/observations/images/{camera}"][:]
+
+                    if video:
+                        # save png images in temporary directory
+                        tmp_imgs_dir = videos_dir / "tmp_images"
+                        save_images_concurrently(imgs_array, tmp_imgs_dir, executor=image_writer)
+
+                        # encode images to a mp4 video
+                        fname = f"{img_key}_episode_{ep_idx:06d}.mp4"
+                        video_path = videos_dir / fname
+                        encode_video_frames(tmp_imgs_dir, video_path, fps)
+
+                        # clean temporary images directory
+                        shutil.rmtree(tmp_imgs_dir)
+
+                        # store the reference to the video frame
+                        ep_dict[img_key] = [
+                            {"path": f"videos/{fname}", "timestamp": i / fps} for i in range(num_frames)
+                        ]
+                    else:
+                        ep_dict[img_key] = [PILImage.fromarray(x) for x in imgs_array]
+
+                ep_dict["observation.state"] = state
+                if "/observations/velocity" in ep:
+                    ep_dict["observation.velocity"] = velocity
+                if "/observations/effort" in ep:
+                    ep_dict["observation.effort"] = effort
+                ep_dict["action"] = action
+                ep_dict["episode_index"] = torch.tensor([ep_idx] * num_frames)
+                ep_dict["frame_index"] = torch.arange(0, num_frames, 1)
+                ep_dict["timestamp"] = torch.arange(0, num_frames, 1) / fps
+                ep_dict["next.done"] = done
+                # TODO(rcadene): add reward and success by computing them in sim
+
+                assert isinstance(ep_idx, int)
+                ep_dicts.append(ep_dict)
+
+            gc.collect()
 
     data_dict = concatenate_episodes(ep_dicts)
 
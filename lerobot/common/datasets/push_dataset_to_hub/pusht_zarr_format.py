@@ -15,9 +15,9 @@
 # limitations under the License.
 """Process zarr files formatted like in: https://github.com/real-stanford/diffusion_policy"""
 
-import shutil
 from pathlib import Path
 
+import numba
 import numpy as np
 import torch
 import tqdm
@@ -25,12 +25,138 @@ import zarr
 from datasets import Dataset, Features, Image, Sequence, Value
 from PIL import Image as PILImage
 
-from lerobot.common.datasets.push_dataset_to_hub.utils import concatenate_episodes, save_images_concurrently
+from lerobot.common.datasets.push_dataset_to_hub.utils import concatenate_episodes
 from lerobot.common.datasets.utils import (
     calculate_episode_data_index,
     hf_transform_to_torch,
 )
-from lerobot.common.datasets.video_utils import VideoFrame, encode_video_frames
+from lerobot.common.datasets.video_utils import VideoFrame, encode_video_frames_from_array
+
+# Vertices of the two rectangles forming the T-shaped block built by `PushTEnv.add_tee` in gym-pusht (with the
+# default `scale=30`), in body-local coordinates.
+PUSHT_TEE_VERTICES = np.array(
+    [
+        [[-60, 30], [60, 30], [60, 0], [-60, 0]],
+        [[-15, 30], [-15, 120], [15, 120], [15, 30]],
+    ],
+    dtype=np.float64,
+)
+# The center of gravity of the block is the mean of the centers of its two rectangles.
+PUSHT_TEE_CENTER_OF_GRAVITY = PUSHT_TEE_VERTICES.mean(axis=1).mean(axis=0)
+# Area of the T-shape. The rectangles are axis-aligned in body-local coordinates, and the area is invariant to the
+# pose of the body, so it is the same for the goal at any pose.
+PUSHT_TEE_AREA = np.prod(np.ptp(PUSHT_TEE_VERTICES, axis=1), axis=-1).sum().item()
+# TODO(rcadene): verify that goal pose is expected to be fixed
+PUSHT_GOAL_POS_ANGLE = np.array([256, 256, np.pi / 4])  # x, y, theta (in radians)
+
+
+def tee_local_to_world(
+    position: np.ndarray, angle: np.ndarray, local_vertices: np.ndarray, center_of_gravity: np.ndarray
+) -> np.ndarray:
+    """Vectorized equivalent of `pymunk.Body.local_to_world` for the vertices of a T-shaped body.
+
+    As in pymunk, the body is first translated to `position` and then rotated by `angle` around its center of
+    gravity.
+
+    Args:
+        position: (N, 2) positions of the bodies.
+        angle: (N,) angles of the bodies (in radians).
+        local_vertices: (2, 4, 2) vertices of the two rectangles forming the T, in body-local coordinates.
+        center_of_gravity: (2,) center of gravity of the body, in body-local coordinates.
+    Returns:
+        (N, 2, 4, 2) vertices of the two rectangles forming each T, in world coordinates.
+    """
+    # Compute in double precision, like pymunk.
+    position = position.astype(np.float64)
+    angle = angle.astype(np.float64)
+    cos, sin = np.cos(angle), np.sin(angle)
+    rot = np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=-2)  # (N, 2, 2)
+    vertices = np.einsum("nij,rvj->nrvi", rot, local_vertices - center_of_gravity)
+    return vertices + (position + center_of_gravity)[:, None, None, :]
+
+
+@numba.njit
+def polygon_area(vertices: np.ndarray) -> float:
+    """Area of a simple polygon given its (N, 2) vertices, using the shoelace formula."""
+    area = 0.0
+    num_vertices = len(vertices)
+    for i in range(num_vertices):
+        j = (i + 1) % num_vertices
+        area += vertices[i, 0] * vertices[j, 1] - vertices[j, 0] * vertices[i, 1]
+    return abs(area) / 2
+
+
+@numba.njit
+def convex_polygons_intersection_area(subject: np.ndarray, clip: np.ndarray) -> float:
+    """Area of the intersection of two convex polygons, using the Sutherland–Hodgman clipping algorithm.
+
+    Args:
+        subject: (N, 2) vertices of the polygon to clip.
+        clip: (M, 2) vertices of the clipping polygon, in clockwise or counter-clockwise order.
+    """
+    # Sign of the clipping polygon's orientation, so that "inside" means a positive cross product.
+    orientation = 0.0
+    for i in range(len(clip)):
+        j = (i + 1) % len(clip)
+        orientation += clip[i, 0] * clip[j, 1] - clip[j, 0] * clip[i, 1]
+    orientation = 1.0 if orientation >= 0 else -1.0
+
+    # Clipping a convex polygon against an edge adds at most one vertex.
+    max_vertices = len(subject) + len(clip)
+    output = np.empty((max_vertices, 2))
+    output[: len(subject)] = subject
+    num_output = len(subject)
+    input_ = np.empty((max_vertices, 2))
+    for i in range(len(clip)):
+        if num_output == 0:
+            break
+        ax, ay = clip[i, 0], clip[i, 1]
+        bx, by = clip[(i + 1) % len(clip), 0], clip[(i + 1) % len(clip), 1]
+        input_[:num_output] = output[:num_output]
+        num_input = num_output
+        num_output = 0
+        for j in range(num_input):
+            px, py = input_[j, 0], input_[j, 1]
+            qx, qy = input_[(j + 1) % num_input, 0], input_[(j + 1) % num_input, 1]
+            side_p = orientation * ((bx - ax) * (py - ay) - (by - ay) * (px - ax))
+            side_q = orientation * ((bx - ax) * (qy - ay) - (by - ay) * (qx - ax))
+            if side_p >= 0:
+                output[num_output, 0] = px
+                output[num_output, 1] = py
+                num_output += 1
+            if (side_p >= 0) != (side_q >= 0):
+                t = side_p / (side_p - side_q)
+                output[num_output, 0] = px + t * (qx - px)
+                output[num_output, 1] = py + t * (qy - py)
+                num_output += 1
+
+    if num_output < 3:
+        return 0.0
+    return polygon_area(output[:num_output])
+
+
+@numba.njit(parallel=True)
+def tee_intersection_area(block_vertices: np.ndarray, goal_vertices: np.ndarray) -> np.ndarray:
+    """Area of the intersection of T-shaped blocks with a T-shaped goal.
+
+    The two rectangles of a T only share an edge, so the area of the intersection of two Ts is the sum of the
+    intersection areas of each pair of rectangles.
+
+    Args:
+        block_vertices: (N, 2, 4, 2) vertices of the two rectangles forming each block.
+        goal_vertices: (2, 4, 2) vertices of the two rectangles forming the goal.
+    Returns:
+        (N,) intersection areas.
+    """
+    num_frames = len(block_vertices)
+    intersection_area = np.zeros(num_frames)
+    for i in numba.prange(num_frames):
+        for j in range(block_vertices.shape[1]):
+            for k in range(goal_vertices.shape[0]):
+                intersection_area[i] += convex_polygons_intersection_area(
+                    block_vertices[i, j], goal_vertices[k]
+                )
+    return intersection_area
 
 
 def check_format(raw_dir):
@@ -55,42 +181,44 @@ def check_format(raw_dir):
 
 
 def load_from_raw(raw_dir: Path, videos_dir: Path, fps: int, video: bool, episodes: list[int] | None = None):
-    try:
-        import pymunk
-        from gym_pusht.envs.pusht import PushTEnv, pymunk_to_shapely
-
-        from lerobot.common.datasets.push_dataset_to_hub._diffusion_policy_replay_buffer import (
-            ReplayBuffer as DiffusionPolicyReplayBuffer,
-        )
-    except ModuleNotFoundError as e:
-        print("`gym_pusht` is not installed. Please install it with `pip install 'lerobot[gym_pusht]'`")
-        raise e
+    from lerobot.common.datasets.push_dataset_to_hub._diffusion_policy_replay_buffer import (
+        ReplayBuffer as DiffusionPolicyReplayBuffer,
+    )
+
     # as define in gmy-pusht env: https://github.com/huggingface/gym-pusht/blob/e0684ff988d223808c0a9dcfaba9dc4991791370/gym_pusht/envs/pusht.py#L174
     success_threshold = 0.95  # 95% coverage,
 
     zarr_path = raw_dir / "pusht_cchi_v7_replay.zarr"
-    zarr_data = DiffusionPolicyReplayBuffer.copy_from_path(zarr_path)
+    # Open the on-disk zarr directly so that each episode is read and decompressed only when processed, instead
+    # of loading the full dataset in memory.
+    zarr_data = DiffusionPolicyReplayBuffer.create_from_path(zarr_path)
 
     episode_ids = torch.from_numpy(zarr_data.get_episode_idxs())
-    assert len(
-        {zarr_data[key].shape[0] for key in zarr_data.keys()}  # noqa: SIM118
+    total_frames = zarr_data["action"].shape[0]
+    keys = list(zarr_data.keys())
+    assert all(
+        zarr_data[key].shape[0] == total_frames for key in keys
     ), "Some data type dont have the same number of total frames."
 
-    # TODO(rcadene): verify that goal pose is expected to be fixed
-    goal_pos_angle = np.array([256, 256, np.pi / 4])  # x, y, theta (in radians)
-    goal_body = PushTEnv.get_goal_pose_body(goal_pos_angle)
-
-    imgs = torch.from_numpy(zarr_data["img"])  # b h w c
-    states = torch.from_numpy(zarr_data["state"])
-    actions = torch.from_numpy(zarr_data["action"])
+    # The goal is the same T-shape at a fixed pose, so it is built once. Its body (see
+    # `PushTEnv.get_goal_pose_body`) has its center of gravity at its origin.
+    goal_vertices = tee_local_to_world(
+        PUSHT_GOAL_POS_ANGLE[None, :2], PUSHT_GOAL_POS_ANGLE[None, 2], PUSHT_TEE_VERTICES, np.zeros(2)
+    )[0]
+
+    # States are small, so they are loaded at once. This allows computing the coverage of the goal by the block
+    # for all the frames with a single call, which is parallelized across frames of all episodes.
+    states = zarr_data["state"][:]
+    block_vertices = tee_local_to_world(
+        states[:, 2:4], states[:, 4], PUSHT_TEE_VERTICES, PUSHT_TEE_CENTER_OF_GRAVITY
+    )
+    coverage = tee_intersection_area(block_vertices, goal_vertices) / PUSHT_TEE_AREA
+    rewards = torch.from_numpy(np.clip(coverage / success_threshold, 0, 1)).type(torch.float32)
+    successes = torch.from_numpy(coverage > success_threshold)
 
-    # load data indices from which each episode starts and ends
-    from_ids, to_ids = [], []
-    from_idx = 0
-    for to_idx in zarr_data.meta["episode_ends"]:
-        from_ids.append(from_idx)
-        to_ids.append(to_idx)
-        from_idx = to_idx
+    # load data indices from which each episode starts and ends, as python ints to slice the data
+    to_ids = zarr_data.meta["episode_ends"][:].tolist()
+    from_ids = [0] + to_ids[:-1]
 
     num_episodes = len(from_ids)
 
@@ -105,63 +233,32 @@ def load_from_raw(raw_dir: Path, videos_dir: Path, fps: int, video: bool, episod
         assert (episode_ids[from_idx:to_idx] == ep_idx).all()
 
         # get image
-        image = imgs[from_idx:to_idx]
+        image = zarr_data["img"][from_idx:to_idx]  # b h w c
         assert image.min() >= 0.0
         assert image.max() <= 255.0
-        image = image.type(torch.uint8)
+        image = image.astype(np.uint8)
 
         # get state
-        state = states[from_idx:to_idx]
+        state = torch.from_numpy(states[from_idx:to_idx])
         agent_pos = state[:, :2]
-        block_pos = state[:, 2:4]
-        block_angle = state[:, 4]
 
         # get reward, success, done
-        reward = torch.zeros(num_frames)
-        success = torch.zeros(num_frames, dtype=torch.bool)
+        reward = rewards[from_idx:to_idx]
+        success = successes[from_idx:to_idx]
         done = torch.zeros(num_frames, dtype=torch.bool)
-        for i in range(num_frames):
-            space = pymunk.Space()
-            space.gravity = 0, 0
-            space.damping = 0
-
-            # Add walls.
-            walls = [
-                PushTEnv.add_segment(space, (5, 506), (5, 5), 2),
-                PushTEnv.add_segment(space, (5, 5), (506, 5), 2),
-                PushTEnv.add_segment(space, (506, 5), (506, 506), 2),
-                PushTEnv.add_segment(space, (5, 506), (506, 506), 2),
-            ]
-            space.add(*walls)
-
-            block_body = PushTEnv.add_tee(space, block_pos[i].tolist(), block_angle[i].item())
-            goal_geom = pymunk_to_shapely(goal_body, block_body.shapes)
-            block_geom = pymunk_to_shapely(block_body, block_body.shapes)
-            intersection_area = goal_geom.intersection(block_geom).area
-            goal_area = goal_geom.area
-            coverage = intersection_area / goal_area
-            reward[i] = np.clip(coverage / success_threshold, 0, 1)
-            success[i] = coverage > success_threshold
 
         # last step of demonstration is considered done
         done[-1] = True
 
         ep_dict = {}
 
-        imgs_array = [x.numpy() for x in image]
+        imgs_array = image
         img_key = "observation.image"
         if video:
-            # save png images in temporary directory
-            tmp_imgs_dir = videos_dir / "tmp_images"
-            save_images_concurrently(imgs_array, tmp_imgs_dir)
-
-            # encode images to a mp4 video
+            # encode images to a mp4 video directly from memory
             fname = f"{img_key}_episode_{ep_idx:06d}.mp4"
             video_path = videos_dir / fname
-            encode_video_frames(tmp_imgs_dir, video_path, fps)
-
-            # clean temporary images directory
-            shutil.rmtree(tmp_imgs_dir)
+            encode_video_frames_from_array(imgs_array, video_path, fps)
 
             # store the reference to the video frame
             ep_dict[img_key] = [{"path": f"videos/{fname}", "timestamp": i / fps} for i in range(num_frames)]
@@ -169,8 +266,8 @@ def load_from_raw(raw_dir: Path, videos_dir: Path, fps: int, video: bool, episod
             ep_dict[img_key] = [PILImage.fromarray(x) for x in imgs_array]
 
         ep_dict["observation.state"] = agent_pos
-        ep_dict["action"] = actions[from_idx:to_idx]
-        ep_dict["episode_index"] = torch.tensor([ep_idx] * num_frames, dtype=torch.int64)
+        ep_dict["action"] = torch.from_numpy(zarr_data["action"][from_idx:to_idx])
+        ep_dict["episode_index"] = torch.full((num_frames,), ep_idx, dtype=torch.int64)
         ep_dict["frame_index"] = torch.arange(0, num_frames, 1)
         ep_dict["timestamp"] = torch.arange(0, num_frames, 1) / fps
         # ep_dict["next.observation.image"] = image[1:],
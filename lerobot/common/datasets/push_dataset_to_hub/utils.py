@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
 import numpy
@@ -40,7 +41,17 @@ def concatenate_episodes(ep_dicts):
     return data_dict
 
 
-def save_images_concurrently(imgs_array: numpy.array, out_dir: Path, max_workers: int = 4):
+def save_images_concurrently(
+    imgs_array: numpy.array,
+    out_dir: Path,
+    max_workers: int = 4,
+    executor: ThreadPoolExecutor | None = None,
+):
+    """Save images as png files in `out_dir` using a pool of threads.
+
+    If provided, `executor` is used to save the images so that the same pool of threads can be reused across
+    calls. Otherwise, a pool of `max_workers` threads is created for this call only.
+    """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -49,5 +60,8 @@ def save_images_concurrently(imgs_array: numpy.array, out_dir: Path, max_workers
         img.save(str(out_dir / f"frame_{i:06d}.png"), quality=100)
 
     num_images = len(imgs_array)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        [executor.submit(save_image, imgs_array[i], i, out_dir) for i in range(num_images)]
+    with nullcontext(executor) if executor is not None else ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(save_image, imgs_array[i], i, out_dir) for i in range(num_images)]
+        # Wait for all the images to be saved, and raise the first error if any.
+        for future in futures:
+            future.result()
@@ -14,11 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import json
+import os
 import re
+import shutil
+import tempfile
 from pathlib import Path
 from typing import Dict
 
 import datasets
+import numpy as np
 import torch
 from datasets import load_dataset, load_from_disk
 from huggingface_hub import hf_hub_download, snapshot_download
@@ -68,18 +72,98 @@ def hf_transform_to_torch(items_dict: dict[torch.Tensor | None]):
     for key in items_dict:
         first_item = items_dict[key][0]
         if isinstance(first_item, PILImage.Image):
-            to_tensor = transforms.ToTensor()
-            items_dict[key] = [to_tensor(img) for img in items_dict[key]]
+            items_dict[key] = _pil_images_to_torch(items_dict[key])
         elif isinstance(first_item, dict) and "path" in first_item and "timestamp" in first_item:
             # video frame will be processed downstream
             pass
         elif first_item is None:
             pass
         else:
-            items_dict[key] = [torch.tensor(x) for x in items_dict[key]]
+            items_dict[key] = _values_to_torch(items_dict[key])
     return items_dict
 
 
+def _pil_images_to_torch(imgs: list[PILImage.Image]) -> list[torch.Tensor]:
+    """Same as applying `transforms.ToTensor` to each image, but done at once for RGB images of the same size."""
+    if all(img.mode == "RGB" for img in imgs) and len({img.size for img in imgs}) == 1:
+        imgs = torch.from_numpy(np.stack([np.asarray(img) for img in imgs]))
+        return list(imgs.permute(0, 3, 1, 2).contiguous().float().div(255))
+    to_tensor = transforms.ToTensor()
+    return [to_tensor(img) for img in imgs]
+
+
+def _values_to_torch(values: list) -> list[torch.Tensor]:
+    """Same as calling `torch.tensor` on each value, but done at once when the values have the same shape."""
+    try:
+        return list(torch.tensor(values))
+    except (ValueError, TypeError):
+        # The values have different shapes.
+        return [torch.tensor(x) for x in values]
+
+
+def get_local_staging_dir() -> Path:
+    """Local directory to stage datasets to: the node-local `$SLURM_TMPDIR` if set, else the system's temp dir."""
+    return Path(os.environ.get("SLURM_TMPDIR", tempfile.gettempdir())) / "lerobot_data"
+
+
+# Files compared to tell whether a staged dataset is up to date: the dataset info, and the state of the arrow
+# data written by `datasets.Dataset.save_to_disk` (which contains its fingerprint).
+_STAGING_CHECK_FILES = ("meta_data/info.json", "train/state.json")
+
+
+def _is_staged(dataset_dir: Path, local_dir: Path) -> bool:
+    if not local_dir.exists():
+        return False
+    for file_name in _STAGING_CHECK_FILES:
+        src_file, local_file = dataset_dir / file_name, local_dir / file_name
+        if src_file.exists() != local_file.exists():
+            return False
+        if src_file.exists() and src_file.read_bytes() != local_file.read_bytes():
+            return False
+    return True
+
+
+def stage_to_local(repo_ids: list[str], root: Path, local_root: Path) -> Path:
+    """Copy the datasets stored under `root` (e.g. on a network file system) to `local_root`.
+
+    Datasets are read with many small random accesses during training, which are a lot faster on a local disk.
+    Datasets already present in `local_root` are not copied again, unless their `meta_data/info.json` or
+    `train/state.json` differ from the ones in `root`. Changes to other files only (e.g. videos) are not
+    detected: delete the staged copy to refresh it.
+
+    Runs started at the same time can safely stage the same dataset to the same `local_root`. However, an
+    outdated staged copy is replaced without checking whether other runs are still reading it, so do not update
+    a dataset in `root` while runs using its staged copy are going on.
+
+    Returns:
+        `local_root`, to be used as the new root of the datasets.
+    """
+    for repo_id in repo_ids:
+        dataset_dir = Path(root) / repo_id
+        local_dir = local_root / repo_id
+        if _is_staged(dataset_dir, local_dir):
+            continue
+        local_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Copy to a temporary directory, unique to this call, first: an interrupted copy is not mistaken for a
+        # complete one, and concurrent runs do not write to the same directory.
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f"{local_dir.name}.", suffix=".tmp", dir=local_dir.parent))
+        try:
+            shutil.copytree(dataset_dir, tmp_dir, dirs_exist_ok=True)
+            # Another run may have staged the dataset in the meantime.
+            if _is_staged(dataset_dir, local_dir):
+                continue
+            shutil.rmtree(local_dir, ignore_errors=True)
+            try:
+                tmp_dir.rename(local_dir)
+            except OSError:
+                # Another run staged the dataset between the check and the rename.
+                if not _is_staged(dataset_dir, local_dir):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return local_root
+
+
 def load_hf_dataset(repo_id, version, root, split) -> datasets.Dataset:
     """hf_dataset contains all the observations, states, actions, rewards, etc."""
     if root is not None:
@@ -354,3 +438,32 @@ def cycle(iterable):
             yield next(iterator)
         except StopIteration:
             iterator = iter(iterable)
+
+
+def prefetch_to_cuda(iterable, device: torch.device):
+    """Yield the batches (dictionaries of tensors) of `iterable` moved to a CUDA device, one batch ahead.
+
+    The copy of the next batch is issued on a side CUDA stream so that it overlaps with the computations done on
+    the current batch. For the copies to be asynchronous, the batches should be in pinned memory (see the
+    `pin_memory` argument of `torch.utils.data.DataLoader`).
+    """
+    copy_stream = torch.cuda.Stream(device)
+    compute_stream = torch.cuda.current_stream(device)
+
+    def wait_for_copy(batch, copy_done):
+        compute_stream.wait_event(copy_done)
+        for value in batch.values():
+            # The tensors were allocated on the copy stream, but are used on the compute stream.
+            value.record_stream(compute_stream)
+        return batch
+
+    prefetched = None
+    for batch in iterable:
+        with torch.cuda.stream(copy_stream):
+            batch = {key: value.to(device, non_blocking=True) for key, value in batch.items()}
+            copy_done = copy_stream.record_event()
+        if prefetched is not None:
+            yield wait_for_copy(*prefetched)
+        prefetched = (batch, copy_done)
+    if prefetched is not None:
+        yield wait_for_copy(*prefetched)
@@ -20,6 +20,7 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, ClassVar
 
+import numpy as np
 import pyarrow as pa
 import torch
 import torchvision
@@ -176,6 +177,29 @@ def encode_video_frames(imgs_dir: Path, video_path: Path, fps: int):
     subprocess.run(ffmpeg_cmd.split(" "), check=True)
 
 
+def encode_video_frames_from_array(imgs_array: np.ndarray, video_path: Path, fps: int):
+    """Same as `encode_video_frames`, but the frames are piped to ffmpeg from memory instead of being read from
+    png files. `imgs_array` is a uint8 array of RGB frames of shape (num_frames, height, width, 3).
+    """
+    video_path = Path(video_path)
+    video_path.parent.mkdir(parents=True, exist_ok=True)
+
+    _, height, width, _ = imgs_array.shape
+    ffmpeg_cmd = (
+        f"ffmpeg -r {fps} "
+        "-f rawvideo "
+        "-pix_fmt rgb24 "
+        f"-s {width}x{height} "
+        "-loglevel error "
+        "-i - "
+        "-vcodec libx264 "
+        "-g 2 "
+        "-pix_fmt yuv444p "
+        f"{str(video_path)}"
+    )
+    subprocess.run(ffmpeg_cmd.split(" "), input=np.ascontiguousarray(imgs_array).tobytes(), check=True)
+
+
 @dataclass
 class VideoFrame:
     # TODO(rcadene, lhoestq): move to Hugging Face `datasets` repo
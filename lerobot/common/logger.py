@@ -18,12 +18,16 @@
 # TODO(rcadene, alexander-soare): clean this file
 """
 
+import copy
 import logging
 import os
 import re
+from concurrent.futures import Future, ThreadPoolExecutor
 from glob import glob
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import torch
 from huggingface_hub.constants import SAFETENSORS_SINGLE_FILE
 from omegaconf import DictConfig, OmegaConf
@@ -32,7 +36,11 @@ from torch.optim import Optimizer
 from torch.optim.lr_scheduler import LRScheduler
 
 from lerobot.common.policies.policy_protocol import Policy
-from lerobot.common.utils.utils import get_global_random_state, set_global_random_state
+from lerobot.common.utils.utils import (
+    get_global_random_state,
+    scalar_tensors_to_python,
+    set_global_random_state,
+)
 
 
 def log_output_dir(out_dir):
@@ -50,6 +58,20 @@ def cfg_to_group(cfg: DictConfig, return_list: bool = False) -> list[str] | str:
     return lst if return_list else "-".join(lst)
 
 
+def _snapshot_state(state):
+    """Return a copy of a (nested) state dict with its tensors copied to CPU.
+
+    This allows writing it to disk while training goes on and modifies the original state in place.
+    """
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {k: _snapshot_state(v) for k, v in state.items()}
+    if isinstance(state, list):
+        return [_snapshot_state(v) for v in state]
+    return copy.deepcopy(state)
+
+
 def get_wandb_run_id_from_filesystem(checkpoint_dir: Path) -> str:
     # Get the WandB run ID.
     paths = glob(str(checkpoint_dir / "../wandb/latest-run/run-*"))
@@ -90,11 +112,18 @@ class Logger:
             job_name: The WandB job name.
         """
         self._cfg = cfg
+        # YAML dump of the config saved with each checkpoint. It is created on the first save, once the
+        # config has been fully set up (see `resolve_delta_timestamps`).
+        self._cfg_yaml = None
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.checkpoints_dir = self.get_checkpoints_dir(log_dir)
+        self.checkpoints_dir.mkdir(parents=True, exist_ok=True)
         self.last_checkpoint_dir = self.get_last_checkpoint_dir(log_dir)
         self.last_pretrained_model_dir = self.get_last_pretrained_model_dir(log_dir)
+        # Training states are written to disk in a background thread, one at a time.
+        self._checkpoint_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending_checkpoint: Future | None = None
 
         # Set up WandB.
         self._group = cfg_to_group(cfg)
@@ -105,6 +134,8 @@ class Logger:
         if run_offline:
             logging.info(colored("Logs will be saved locally.", "yellow", attrs=["bold"]))
             self._wandb = None
+            self._upload_pool = None
+            self._pending_uploads = []
         else:
             os.environ["WANDB_SILENT"] = "true"
             import wandb
@@ -131,6 +162,9 @@ class Logger:
             print(colored("Logs will be synced with wandb.", "blue", attrs=["bold"]))
             logging.info(f"Track this run --> {colored(wandb.run.get_url(), 'yellow', attrs=['bold'])}")
             self._wandb = wandb
+            # Artifact uploads are I/O bound, so they run in a background thread to not block training.
+            self._upload_pool = ThreadPoolExecutor(max_workers=1)
+            self._pending_uploads: list[Future] = []
 
     @classmethod
     def get_checkpoints_dir(cls, log_dir: str | Path) -> Path:
@@ -155,19 +189,19 @@ class Logger:
 
         The weights are saved in a folder called "pretrained_model" under the checkpoint directory.
 
-        Optionally also upload the model to WandB.
+        Optionally also upload the model to WandB. The upload happens in a background thread; call `finish`
+        to wait for pending uploads.
         """
-        self.checkpoints_dir.mkdir(parents=True, exist_ok=True)
         policy.save_pretrained(save_dir)
         # Also save the full Hydra config for the env configuration.
-        OmegaConf.save(self._cfg, save_dir / "config.yaml")
+        if self._cfg_yaml is None:
+            self._cfg_yaml = OmegaConf.to_yaml(self._cfg)
+        (save_dir / "config.yaml").write_text(self._cfg_yaml, encoding="utf-8")
         if self._wandb and not self._cfg.wandb.disable_artifact:
             # note wandb artifact does not accept ":" or "/" in its name
             artifact = self._wandb.Artifact(wandb_artifact_name, type="model")
             artifact.add_file(save_dir / SAFETENSORS_SINGLE_FILE)
-            self._wandb.log_artifact(artifact)
-        if self.last_checkpoint_dir.exists():
-            os.remove(self.last_checkpoint_dir)
+            self._pending_uploads.append(self._upload_pool.submit(self._wandb.log_artifact, artifact))
 
     def save_training_state(
         self,
@@ -180,6 +214,12 @@ class Logger:
 
         All of these are saved as "training_state.pth" under the checkpoint directory.
         """
+        training_state = self._get_training_state(train_step, optimizer, scheduler)
+        torch.save(training_state, save_dir / self.training_state_file_name)
+
+    def _get_training_state(
+        self, train_step: int, optimizer: Optimizer, scheduler: LRScheduler | None
+    ) -> dict[str, Any]:
         training_state = {
             "step": train_step,
             "optimizer": optimizer.state_dict(),
@@ -187,7 +227,21 @@ class Logger:
         }
         if scheduler is not None:
             training_state["scheduler"] = scheduler.state_dict()
-        torch.save(training_state, save_dir / self.training_state_file_name)
+        return training_state
+
+    def _write_training_state_and_link_last(self, checkpoint_dir: Path, training_state: dict[str, Any]):
+        torch.save(training_state, checkpoint_dir / self.training_state_file_name)
+        # Replace the "last" link atomically, so that it always points to a complete checkpoint to resume from.
+        tmp_link = self.last_checkpoint_dir.with_name(self.last_checkpoint_dir.name + ".tmp")
+        tmp_link.unlink(missing_ok=True)
+        os.symlink(checkpoint_dir.absolute(), tmp_link)
+        os.replace(tmp_link, self.last_checkpoint_dir)
+
+    def wait_for_checkpoint(self):
+        """Wait for the training state of the last checkpoint to be written. Raise its error if it failed."""
+        if self._pending_checkpoint is not None:
+            pending_checkpoint, self._pending_checkpoint = self._pending_checkpoint, None
+            pending_checkpoint.result()
 
     def save_checkpont(
         self,
@@ -197,7 +251,14 @@ class Logger:
         scheduler: LRScheduler | None,
         identifier: str,
     ):
-        """Checkpoint the model weights and the training state."""
+        """Checkpoint the model weights and the training state.
+
+        The training state is snapshotted right away, then written to disk in a background thread so that
+        training can go on meanwhile. The "last" checkpoint link is only updated once it is written. Call
+        `wait_for_checkpoint` (or `finish`) to wait for it.
+        """
+        # The previous checkpoint must be complete before the "last" link is replaced.
+        self.wait_for_checkpoint()
         checkpoint_dir = self.checkpoints_dir / str(identifier)
         wandb_artifact_name = (
             None
@@ -207,8 +268,10 @@ class Logger:
         self.save_model(
             checkpoint_dir / self.pretrained_model_dir_name, policy, wandb_artifact_name=wandb_artifact_name
         )
-        self.save_training_state(checkpoint_dir, train_step, optimizer, scheduler)
-        os.symlink(checkpoint_dir.absolute(), self.last_checkpoint_dir)
+        training_state = _snapshot_state(self._get_training_state(train_step, optimizer, scheduler))
+        self._pending_checkpoint = self._checkpoint_pool.submit(
+            self._write_training_state_and_link_last, checkpoint_dir, training_state
+        )
 
     def load_last_training_state(self, optimizer: Optimizer, scheduler: LRScheduler | None) -> int:
         """
@@ -231,16 +294,42 @@ class Logger:
         assert mode in {"train", "eval"}
         # TODO(alexander-soare): Add local text log.
         if self._wandb is not None:
-            for k, v in d.items():
+            wandb_log_dict = {}
+            # Scalar tensors are logged as python numbers, converted all at once.
+            for k, v in scalar_tensors_to_python(d).items():
                 if not isinstance(v, (int, float, str)):
                     logging.warning(
                         f'WandB logging of key "{k}" was ignored as its type is not handled by this wrapper.'
                     )
                     continue
-                self._wandb.log({f"{mode}/{k}": v}, step=step)
+                wandb_log_dict[f"{mode}/{k}"] = v
+            # Log all the items with a single call rather than one call per item.
+            self._wandb.log(wandb_log_dict, step=step)
 
-    def log_video(self, video_path: str, step: int, mode: str = "train"):
+    def log_video(self, video: str | np.ndarray | torch.Tensor, step: int, mode: str = "train"):
+        """Log a video to WandB, given either the path to a mp4 file or its (t, c, h, w) uint8 frames.
+
+        This is a no-op when WandB is disabled.
+        """
         assert mode in {"train", "eval"}
-        assert self._wandb is not None
-        wandb_video = self._wandb.Video(video_path, fps=self._cfg.fps, format="mp4")
+        if self._wandb is None:
+            return
+        if isinstance(video, torch.Tensor):
+            # Hand the frames to wandb as a CPU uint8 array so they are only moved and converted once.
+            video = video.detach().to("cpu", dtype=torch.uint8).numpy()
+        wandb_video = self._wandb.Video(video, fps=self._cfg.fps, format="mp4")
         self._wandb.log({f"{mode}/video": wandb_video}, step=step)
+
+    def finish(self):
+        """Wait for the pending checkpoint and artifact uploads, and close the WandB run, if any."""
+        self.wait_for_checkpoint()
+        self._checkpoint_pool.shutdown()
+        if self._wandb is None:
+            return
+        self._upload_pool.shutdown(wait=True)
+        try:
+            # Raise the error of the first failed artifact upload, if any.
+            for upload in self._pending_uploads:
+                upload.result()
+        finally:
+            self._wandb.finish()
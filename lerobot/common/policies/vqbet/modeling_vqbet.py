@@ -1,3 +1,4 @@
+import logging
 import math
 import warnings
 from collections import deque
@@ -415,7 +416,7 @@ class VQBeTHead(nn.Module):
         if self.vqvae_model.optimized_steps >= n_vqvae_training_steps:
             self.vqvae_model.discretized = torch.tensor(True)
             self.vqvae_model.vq_layer.freeze_codebook = torch.tensor(True)
-            print("Finished discretizing action data!")
+            logging.info("Finished discretizing action data!")
             self.vqvae_model.eval()
             for param in self.vqvae_model.vq_layer.parameters():
                 param.requires_grad = False
@@ -639,6 +640,8 @@ class VQBeTOptimizer(torch.optim.Adam):
             cfg.training.lr,
             cfg.training.adam_betas,
             cfg.training.adam_eps,
+            # Use the fused implementation, which updates all the parameters with a few kernels, on CUDA.
+            fused=True if get_device_from_parameters(policy).type == "cuda" else None,
         )
 
 
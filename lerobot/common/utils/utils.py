@@ -48,6 +48,18 @@ def get_safe_torch_device(cfg_device: str, log: bool = False) -> torch.device:
     return device
 
 
+def get_amp_dtype(cfg_amp_dtype: str | None) -> torch.dtype | None:
+    """Given a string like "float16" or "bfloat16", return the torch.dtype to autocast to.
+
+    None means that autocast uses the default dtype of the device (float16 on CUDA, bfloat16 on CPU).
+    """
+    if cfg_amp_dtype is None:
+        return None
+    if cfg_amp_dtype not in ("float16", "bfloat16"):
+        raise ValueError(f"Unsupported AMP dtype: {cfg_amp_dtype}. Expected 'float16' or 'bfloat16'.")
+    return getattr(torch, cfg_amp_dtype)
+
+
 def get_global_random_state() -> dict[str, Any]:
     """Get the random state for `random`, `numpy`, and `torch`."""
     random_state_dict = {
@@ -120,6 +132,19 @@ def init_logging():
     logging.getLogger().addHandler(console_handler)
 
 
+def scalar_tensors_to_python(d: dict[str, Any]) -> dict[str, Any]:
+    """Return a copy of a dictionary with its scalar tensors converted to python numbers.
+
+    The tensors are transferred together, so that only one device synchronization is needed.
+    """
+    keys = [k for k, v in d.items() if isinstance(v, torch.Tensor) and v.ndim == 0]
+    if len(keys) == 0:
+        return dict(d)
+    device = d[keys[0]].device
+    values = torch.stack([d[k].detach().to(device, torch.float32) for k in keys]).tolist()
+    return {**d, **dict(zip(keys, values, strict=True))}
+
+
 def format_big_number(num, precision=0):
     suffixes = ["", "K", "M", "B", "T", "Q"]
     divisor = 1000.0
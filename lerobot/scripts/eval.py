@@ -47,7 +47,6 @@ import logging
 import threading
 import time
 from contextlib import nullcontext
-from copy import deepcopy
 from datetime import datetime as dt
 from pathlib import Path
 from typing import Callable
@@ -73,7 +72,13 @@ from lerobot.common.policies.factory import make_policy
 from lerobot.common.policies.policy_protocol import Policy
 from lerobot.common.policies.utils import get_device_from_parameters
 from lerobot.common.utils.io_utils import write_video
-from lerobot.common.utils.utils import get_safe_torch_device, init_hydra_config, init_logging, set_global_seed
+from lerobot.common.utils.utils import (
+    get_amp_dtype,
+    get_safe_torch_device,
+    init_hydra_config,
+    init_logging,
+    set_global_seed,
+)
 
 
 def rollout(
@@ -126,7 +131,9 @@ def rollout(
     if render_callback is not None:
         render_callback(env)
 
-    all_observations = []
+    # Observations are written in place into buffers preallocated on the first step, which have room for the
+    # extra observation tracked after the environments are done.
+    all_observations = {}
     all_actions = []
     all_rewards = []
     all_successes = []
@@ -135,6 +142,8 @@ def rollout(
     step = 0
     # Keep track of which environments are done.
     done = np.array([False] * env.num_envs)
+    # Keep track of which environments have succeeded so far, for the running success rate.
+    any_success = np.array([False] * env.num_envs)
     max_steps = env.call("_max_episode_steps")[0]
     progbar = trange(
         max_steps,
@@ -146,7 +155,13 @@ def rollout(
         # Numpy array to tensor and changing dictionary keys to LeRobot policy format.
         observation = preprocess_observation(observation)
         if return_observations:
-            all_observations.append(deepcopy(observation))
+            if step == 0:
+                all_observations = {
+                    key: torch.empty((env.num_envs, max_steps + 1, *obs.shape[1:]), dtype=obs.dtype)
+                    for key, obs in observation.items()
+                }
+            for key in observation:
+                all_observations[key][:, step] = observation[key]
 
         observation = {key: observation[key].to(device, non_blocking=True) for key in observation}
 
@@ -178,16 +193,16 @@ def rollout(
         all_successes.append(torch.tensor(successes))
 
         step += 1
-        running_success_rate = (
-            einops.reduce(torch.stack(all_successes, dim=1), "b n -> b", "any").numpy().mean()
-        )
+        any_success |= np.array(successes)
+        running_success_rate = any_success.mean()
         progbar.set_postfix({"running_success_rate": f"{running_success_rate.item() * 100:.1f}%"})
         progbar.update()
 
     # Track the final observation.
     if return_observations:
         observation = preprocess_observation(observation)
-        all_observations.append(deepcopy(observation))
+        for key in observation:
+            all_observations[key][:, step] = observation[key]
 
     # Stack the sequence along the first dimension so that we have (batch, sequence, *) tensors.
     ret = {
@@ -197,10 +212,7 @@ def rollout(
         "done": torch.stack(all_dones, dim=1),
     }
     if return_observations:
-        stacked_observations = {}
-        for key in all_observations[0]:
-            stacked_observations[key] = torch.stack([obs[key] for obs in all_observations], dim=1)
-        ret["observation"] = stacked_observations
+        ret["observation"] = {key: obs[:, : step + 1] for key, obs in all_observations.items()}
 
     return ret
 
@@ -437,6 +449,10 @@ def _compile_episode_data(
     episode_data_index = {"from": [], "to": []}
     total_frames = 0
     data_index_from = start_data_index
+    # Frame indices and timestamps are the same for all the episodes, so they are computed once for the longest
+    # possible episode and sliced.
+    frame_indices = torch.arange(0, rollout_data["action"].shape[1], 1)
+    timestamps = frame_indices / fps
     for ep_ix in range(rollout_data["action"].shape[0]):
         num_frames = done_indices[ep_ix].item() + 1  # + 1 to include the first done frame
         total_frames += num_frames
@@ -445,9 +461,9 @@ def _compile_episode_data(
         # of a done state. it is critical to have this frame for tdmpc to predict a "done observation/state"
         ep_dict = {
             "action": rollout_data["action"][ep_ix, :num_frames],
-            "episode_index": torch.tensor([start_episode_index + ep_ix] * num_frames),
-            "frame_index": torch.arange(0, num_frames, 1),
-            "timestamp": torch.arange(0, num_frames, 1) / fps,
+            "episode_index": torch.full((num_frames,), start_episode_index + ep_ix),
+            "frame_index": frame_indices[:num_frames],
+            "timestamp": timestamps[:num_frames],
             "next.done": rollout_data["done"][ep_ix, :num_frames],
             "next.reward": rollout_data["reward"][ep_ix, :num_frames].type(torch.float32),
         }
@@ -556,7 +572,11 @@ def main(
     assert isinstance(policy, nn.Module)
     policy.eval()
 
-    with torch.no_grad(), torch.autocast(device_type=device.type) if hydra_cfg.use_amp else nullcontext():
+    amp_dtype = get_amp_dtype(hydra_cfg.get("amp_dtype"))
+    with (
+        torch.inference_mode(),
+        torch.autocast(device_type=device.type, dtype=amp_dtype) if hydra_cfg.use_amp else nullcontext(),
+    ):
         info = eval_policy(
             env,
             policy,
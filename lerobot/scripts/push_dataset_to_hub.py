@@ -44,6 +44,7 @@ python lerobot/scripts/push_dataset_to_hub.py \
 
 import argparse
 import json
+import os
 import shutil
 import warnings
 from pathlib import Path
@@ -205,7 +206,8 @@ def push_dataset_to_hub(
 
     if local_dir:
         hf_dataset = hf_dataset.with_format(None)  # to remove transforms that cant be saved
-        hf_dataset.save_to_disk(str(local_dir / "train"))
+        # Write the arrow shards in parallel. There must be at least as many items as processes.
+        hf_dataset.save_to_disk(str(local_dir / "train"), num_proc=max(1, min(num_workers, len(hf_dataset))))
 
     if push_to_hub or local_dir:
         # mandatory for upload
@@ -235,7 +237,12 @@ def push_dataset_to_hub(
         tests_videos_dir.mkdir(parents=True, exist_ok=True)
         for key in lerobot_dataset.video_frame_keys:
             fname = f"{key}_episode_{episode_index:06d}.mp4"
-            shutil.copy(videos_dir / fname, tests_videos_dir / fname)
+            try:
+                # Hard link the video to avoid duplicating its content on disk.
+                os.link(videos_dir / fname, tests_videos_dir / fname)
+            except OSError:
+                # Fall back to a copy, e.g. when the directories are on different filesystems.
+                shutil.copy(videos_dir / fname, tests_videos_dir / fname)
 
     if local_dir is None:
         # clear cache
@@ -299,7 +306,7 @@ def main():
         "--num-workers",
         type=int,
         default=8,
-        help="Number of processes of Dataloader for computing the dataset statistics.",
+        help="Number of processes of Dataloader for computing the dataset statistics, and for saving the dataset to `--local-dir`.",
     )
     parser.add_argument(
         "--episodes",
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
+import queue
 import time
 from contextlib import nullcontext
 from pathlib import Path
@@ -30,7 +31,7 @@ from torch.cuda.amp import GradScaler
 from lerobot.common.datasets.factory import make_dataset, resolve_delta_timestamps
 from lerobot.common.datasets.lerobot_dataset import MultiLeRobotDataset
 from lerobot.common.datasets.sampler import EpisodeAwareSampler
-from lerobot.common.datasets.utils import cycle
+from lerobot.common.datasets.utils import cycle, prefetch_to_cuda
 from lerobot.common.envs.factory import make_env
 from lerobot.common.logger import Logger, log_output_dir
 from lerobot.common.policies.factory import make_policy
@@ -38,15 +39,20 @@ from lerobot.common.policies.policy_protocol import PolicyWithUpdate
 from lerobot.common.policies.utils import get_device_from_parameters
 from lerobot.common.utils.utils import (
     format_big_number,
+    get_amp_dtype,
     get_safe_torch_device,
     init_hydra_config,
     init_logging,
+    scalar_tensors_to_python,
     set_global_seed,
 )
 from lerobot.scripts.eval import eval_policy
 
 
 def make_optimizer_and_scheduler(cfg, policy):
+    # On CUDA, use the fused implementations of Adam and AdamW, which update all the parameters with a few
+    # kernels instead of several kernels per parameter. Otherwise, let torch pick its default implementation.
+    fused = True if get_device_from_parameters(policy).type == "cuda" else None
     if cfg.policy.name == "act":
         optimizer_params_dicts = [
             {
@@ -66,7 +72,7 @@ def make_optimizer_and_scheduler(cfg, policy):
             },
         ]
         optimizer = torch.optim.AdamW(
-            optimizer_params_dicts, lr=cfg.training.lr, weight_decay=cfg.training.weight_decay
+            optimizer_params_dicts, lr=cfg.training.lr, weight_decay=cfg.training.weight_decay, fused=fused
         )
         lr_scheduler = None
     elif cfg.policy.name == "diffusion":
@@ -76,6 +82,7 @@ def make_optimizer_and_scheduler(cfg, policy):
             cfg.training.adam_betas,
             cfg.training.adam_eps,
             cfg.training.adam_weight_decay,
+            fused=fused,
         )
         from diffusers.optimization import get_scheduler
 
@@ -86,7 +93,7 @@ def make_optimizer_and_scheduler(cfg, policy):
             num_training_steps=cfg.training.offline_steps,
         )
     elif policy.name == "tdmpc":
-        optimizer = torch.optim.Adam(policy.parameters(), cfg.training.lr)
+        optimizer = torch.optim.Adam(policy.parameters(), cfg.training.lr, fused=fused)
         lr_scheduler = None
     elif cfg.policy.name == "vqbet":
         from lerobot.common.policies.vqbet.modeling_vqbet import VQBeTOptimizer, VQBeTScheduler
@@ -101,22 +108,39 @@ def make_optimizer_and_scheduler(cfg, policy):
 
 def update_policy(
     policy,
-    batch,
+    dl_iter,
     optimizer,
     grad_clip_norm,
     grad_scaler: GradScaler,
     lr_scheduler=None,
     use_amp: bool = False,
+    amp_dtype: torch.dtype | None = None,
+    grad_accumulation_steps: int = 1,
 ):
-    """Returns a dictionary of items for logging."""
+    """Do one optimization step with the gradients accumulated over `grad_accumulation_steps` batches.
+
+    The batches are taken from the `dl_iter` iterator one at a time, so that only one of them is held in
+    memory.
+
+    Returns a dictionary of items for logging.
+    """
     start_time = time.perf_counter()
     device = get_device_from_parameters(policy)
     policy.train()
-    with torch.autocast(device_type=device.type) if use_amp else nullcontext():
-        output_dict = policy.forward(batch)
-        # TODO(rcadene): policy.unnormalize_outputs(out_dict)
-        loss = output_dict["loss"]
-    grad_scaler.scale(loss).backward()
+    loss = 0
+    dataloading_s = 0
+    for _ in range(grad_accumulation_steps):
+        dataloading_start_time = time.perf_counter()
+        batch = next(dl_iter)
+        dataloading_s += time.perf_counter() - dataloading_start_time
+        with torch.autocast(device_type=device.type, dtype=amp_dtype) if use_amp else nullcontext():
+            output_dict = policy.forward(batch)
+            # TODO(rcadene): policy.unnormalize_outputs(out_dict)
+            # Average the loss over the batches, so that the accumulated gradients are the ones of a single
+            # batch made of all of them.
+            batch_loss = output_dict["loss"] / grad_accumulation_steps
+        grad_scaler.scale(batch_loss).backward()
+        loss += batch_loss.detach()
 
     # Unscale the graident of the optimzer's assigned params in-place **prior to gradient clipping**.
     grad_scaler.unscale_(optimizer)
@@ -133,7 +157,9 @@ def update_policy(
     # Updates the scale for next iteration.
     grad_scaler.update()
 
-    optimizer.zero_grad()
+    # Release the gradients rather than filling them with zeros, so that they are not kept in memory until the
+    # next backward pass.
+    optimizer.zero_grad(set_to_none=True)
 
     if lr_scheduler is not None:
         lr_scheduler.step()
@@ -142,11 +168,14 @@ def update_policy(
         # To possibly update an internal buffer (for instance an Exponential Moving Average like in TDMPC).
         policy.update()
 
+    # The loss and gradient norm are kept as tensors: converting them to python numbers requires to wait for
+    # the device, so it is only done when they are logged (see `log_train_info`).
     info = {
-        "loss": loss.item(),
-        "grad_norm": float(grad_norm),
+        "loss": loss,
+        "grad_norm": grad_norm,
         "lr": optimizer.param_groups[0]["lr"],
-        "update_s": time.perf_counter() - start_time,
+        "update_s": time.perf_counter() - start_time - dataloading_s,
+        "dataloading_s": dataloading_s,
         **{k: v for k, v in output_dict.items() if k != "loss"},
     }
 
@@ -154,6 +183,7 @@ def update_policy(
 
 
 def log_train_info(logger: Logger, info, step, cfg, dataset, is_offline):
+    info = scalar_tensors_to_python(info)
     loss = info["loss"]
     grad_norm = info["grad_norm"]
     lr = info["lr"]
@@ -162,7 +192,7 @@ def log_train_info(logger: Logger, info, step, cfg, dataset, is_offline):
 
     # A sample is an (observation,action) pair, where observation and action
     # can be on multiple timestamps. In a batch, we have `batch_size`` number of samples.
-    num_samples = (step + 1) * cfg.training.batch_size
+    num_samples = (step + 1) * cfg.training.batch_size * cfg.training.get("grad_accumulation_steps", 1)
     avg_samples_per_ep = dataset.num_samples / dataset.num_episodes
     num_episodes = num_samples / avg_samples_per_ep
     num_epochs = num_samples / dataset.num_samples
@@ -192,14 +222,19 @@ def log_train_info(logger: Logger, info, step, cfg, dataset, is_offline):
     logger.log_dict(info, step, mode="train")
 
 
-def log_eval_info(logger, info, step, cfg, dataset, is_offline):
+def log_eval_info(logger, info, step, cfg, dataset, is_offline, log_step: int | None = None):
+    """Log the evaluation info of the policy at training step `step`.
+
+    `log_step` is the step at which the info is logged, if it differs from `step` (when the evaluation ran in
+    the background while training went on).
+    """
     eval_s = info["eval_s"]
     avg_sum_reward = info["avg_sum_reward"]
     pc_success = info["pc_success"]
 
     # A sample is an (observation,action) pair, where observation and action
     # can be on multiple timestamps. In a batch, we have `batch_size`` number of samples.
-    num_samples = (step + 1) * cfg.training.batch_size
+    num_samples = (step + 1) * cfg.training.batch_size * cfg.training.get("grad_accumulation_steps", 1)
     avg_samples_per_ep = dataset.num_samples / dataset.num_episodes
     num_episodes = num_samples / avg_samples_per_ep
     num_epochs = num_samples / dataset.num_samples
@@ -223,7 +258,38 @@ def log_eval_info(logger, info, step, cfg, dataset, is_offline):
     info["num_epochs"] = num_epochs
     info["is_offline"] = is_offline
 
-    logger.log_dict(info, step, mode="eval")
+    logger.log_dict(info, step if log_step is None else log_step, mode="eval")
+
+
+def eval_policy_in_background(
+    cfg: DictConfig, policy_state_dict: dict, dataset_stats: dict, videos_dir: Path, result_queue
+):
+    """Evaluate a snapshot of the policy, and put the results in `result_queue`.
+
+    This is the target of the subprocesses used to evaluate the policy while training goes on (see
+    `training.async_eval`). The environment and the policy are created in the subprocess.
+    """
+    init_logging()
+    set_global_seed(cfg.seed)
+    eval_env = make_env(cfg)
+    policy = make_policy(hydra_cfg=cfg, dataset_stats=dataset_stats)
+    policy.load_state_dict(policy_state_dict)
+    device = get_device_from_parameters(policy)
+    amp_dtype = get_amp_dtype(cfg.get("amp_dtype"))
+    with (
+        torch.inference_mode(),
+        torch.autocast(device_type=device.type, dtype=amp_dtype) if cfg.use_amp else nullcontext(),
+    ):
+        eval_info = eval_policy(
+            eval_env,
+            policy,
+            cfg.eval.n_episodes,
+            videos_dir=videos_dir,
+            max_episodes_rendered=4,
+            start_seed=cfg.seed,
+        )
+    eval_env.close()
+    result_queue.put({"aggregated": eval_info["aggregated"], "video_paths": eval_info["video_paths"]})
 
 
 def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = None):
@@ -300,8 +366,10 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
     # Create environment used for evaluating checkpoints during training on simulation data.
     # On real-world data, no need to create an environment as evaluations are done outside train.py,
     # using the eval.py instead, with gym_dora environment and dora-rs.
+    # With `async_eval`, the evaluations run in subprocesses with their own environment.
+    async_eval = cfg.training.get("async_eval", False)
     eval_env = None
-    if cfg.training.eval_freq > 0:
+    if cfg.training.eval_freq > 0 and not async_eval:
         logging.info("make_env")
         eval_env = make_env(cfg)
 
@@ -312,10 +380,17 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
         pretrained_policy_name_or_path=str(logger.last_pretrained_model_dir) if cfg.resume else None,
     )
     assert isinstance(policy, nn.Module)
+    if cfg.training.get("compile", False):
+        # Only compile the training forward pass. The policy module itself is kept as is, so that it can still
+        # be saved and evaluated normally. Batches have a fixed shape (see `drop_last` below), so CUDA graphs
+        # can be used to reduce the kernel launch overhead.
+        policy.forward = torch.compile(policy.forward, mode="reduce-overhead", dynamic=False)
     # Create optimizer and scheduler
     # Temporary hack to move optimizer out of policy
     optimizer, lr_scheduler = make_optimizer_and_scheduler(cfg, policy)
-    grad_scaler = GradScaler(enabled=cfg.use_amp)
+    amp_dtype = get_amp_dtype(cfg.get("amp_dtype"))
+    # bfloat16 has the same exponent range as float32, so gradients do not need to be scaled.
+    grad_scaler = GradScaler(enabled=cfg.use_amp and amp_dtype != torch.bfloat16)
 
     step = 0  # number of policy updates (forward + backward + optim)
 
@@ -334,14 +409,72 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
     logging.info(f"{num_learnable_params=} ({format_big_number(num_learnable_params)})")
     logging.info(f"{num_total_params=} ({format_big_number(num_total_params)})")
 
+    # The training step, process and result queue of the evaluation running in the background, if any.
+    background_eval = None
+    mp_context = torch.multiprocessing.get_context("spawn")
+
+    def log_background_eval_if_done(step, wait=False):
+        """Log the results of the evaluation running in the background once it is done (or wait for it)."""
+        nonlocal background_eval
+        if background_eval is None:
+            return
+        eval_step, process, result_queue = background_eval
+        while True:
+            exited = not process.is_alive()
+            try:
+                eval_info = result_queue.get(timeout=1) if wait else result_queue.get(block=False)
+                break
+            except queue.Empty:
+                if exited:
+                    raise RuntimeError(
+                        f"The evaluation of the policy at step {eval_step} failed "
+                        f"(exit code {process.exitcode})."
+                    ) from None
+                if not wait:
+                    return
+        process.join()
+        background_eval = None
+        # Logs can not go back in time, so the results are logged at the current step.
+        log_eval_info(
+            logger, eval_info["aggregated"], eval_step, cfg, offline_dataset, is_offline=True, log_step=step
+        )
+        logger.log_video(eval_info["video_paths"][0], step, mode="eval")
+
+    # Steps are used as identifiers for evaluation videos and checkpoints. Format them to have at least 6
+    # digits but more if needed (choose 6 as a minimum for consistency without being overkill).
+    _num_digits = max(6, len(str(cfg.training.offline_steps + cfg.training.online_steps)))
+
     # Note: this helper will be used in offline and online training loops.
     def evaluate_and_checkpoint_if_needed(step):
-        _num_digits = max(6, len(str(cfg.training.offline_steps + cfg.training.online_steps)))
+        nonlocal background_eval
         step_identifier = f"{step:0{_num_digits}d}"
-
-        if cfg.training.eval_freq > 0 and step % cfg.training.eval_freq == 0:
+        # Note: frequencies of 0 disable the corresponding periodic action.
+        is_eval_step = cfg.training.eval_freq > 0 and step % cfg.training.eval_freq == 0
+
+        if is_eval_step and async_eval:
+            # Only one evaluation runs in the background at a time.
+            log_background_eval_if_done(step, wait=True)
+            logging.info(f"Eval policy at step {step} in the background")
+            policy_state_dict = {k: v.detach().to("cpu", copy=True) for k, v in policy.state_dict().items()}
+            result_queue = mp_context.Queue()
+            process = mp_context.Process(
+                target=eval_policy_in_background,
+                args=(
+                    cfg,
+                    policy_state_dict,
+                    offline_dataset.stats,
+                    Path(out_dir) / "eval" / f"videos_step_{step_identifier}",
+                    result_queue,
+                ),
+            )
+            process.start()
+            background_eval = (step, process, result_queue)
+        elif is_eval_step:
             logging.info(f"Eval policy at step {step}")
-            with torch.no_grad(), torch.autocast(device_type=device.type) if cfg.use_amp else nullcontext():
+            with (
+                torch.inference_mode(),
+                torch.autocast(device_type=device.type, dtype=amp_dtype) if cfg.use_amp else nullcontext(),
+            ):
                 assert eval_env is not None
                 eval_info = eval_policy(
                     eval_env,
@@ -352,17 +485,14 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
                     start_seed=cfg.seed,
                 )
             log_eval_info(logger, eval_info["aggregated"], step, cfg, offline_dataset, is_offline=True)
-            if cfg.wandb.enable:
-                logger.log_video(eval_info["video_paths"][0], step, mode="eval")
+            logger.log_video(eval_info["video_paths"][0], step, mode="eval")
             logging.info("Resume training")
 
         if cfg.training.save_checkpoint and (
-            step % cfg.training.save_freq == 0
+            (cfg.training.save_freq > 0 and step % cfg.training.save_freq == 0)
             or step == cfg.training.offline_steps + cfg.training.online_steps
         ):
             logging.info(f"Checkpoint policy after step {step}")
-            # Note: Save with step as the identifier, and format it to have at least 6 digits but more if
-            # needed (choose 6 as a minimum for consistency without being overkill).
             logger.save_checkpont(
                 step,
                 policy,
@@ -389,37 +519,46 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
         batch_size=cfg.training.batch_size,
         shuffle=shuffle,
         sampler=sampler,
-        pin_memory=device.type != "cpu",
-        drop_last=False,
+        # Page-locked memory only speeds up host to device copies for CUDA, and it allows the asynchronous
+        # transfers of the batches in `prefetch_to_cuda` below.
+        pin_memory=device.type == "cuda",
+        # Drop the last incomplete batch when compiling, so that a new graph is not compiled for its shape.
+        drop_last=cfg.training.get("compile", False),
+        # Keep the workers alive across epochs, instead of re-creating them each time the dataloader is
+        # cycled.
+        persistent_workers=cfg.training.num_workers > 0,
+        prefetch_factor=cfg.training.get("prefetch_factor", 2) if cfg.training.num_workers > 0 else None,
     )
     dl_iter = cycle(dataloader)
+    if device.type == "cuda":
+        # Copy the next batch to the GPU while the policy is being updated on the current one.
+        dl_iter = prefetch_to_cuda(dl_iter, device)
+    elif device.type != "cpu":
+        dl_iter = ({key: value.to(device) for key, value in batch.items()} for batch in dl_iter)
 
-    policy.train()
-    for _ in range(step, cfg.training.offline_steps):
-        if step == 0:
-            logging.info("Start offline training on a fixed dataset")
-
-        start_time = time.perf_counter()
-        batch = next(dl_iter)
-        dataloading_s = time.perf_counter() - start_time
+    # Number of batches over which gradients are accumulated for each optimization step.
+    grad_accumulation_steps = cfg.training.get("grad_accumulation_steps", 1)
 
-        for key in batch:
-            batch[key] = batch[key].to(device, non_blocking=True)
+    if step == 0:
+        logging.info("Start offline training on a fixed dataset")
 
+    policy.train()
+    for _ in range(step, cfg.training.offline_steps):
         train_info = update_policy(
             policy,
-            batch,
+            dl_iter,
             optimizer,
             cfg.training.grad_clip_norm,
             grad_scaler=grad_scaler,
             lr_scheduler=lr_scheduler,
             use_amp=cfg.use_amp,
+            amp_dtype=amp_dtype,
+            grad_accumulation_steps=grad_accumulation_steps,
         )
 
-        train_info["dataloading_s"] = dataloading_s
-
-        if step % cfg.training.log_freq == 0:
+        if cfg.training.log_freq > 0 and step % cfg.training.log_freq == 0:
             log_train_info(logger, train_info, step, cfg, offline_dataset, is_offline=True)
+            log_background_eval_if_done(step)
 
         # Note: evaluate_and_checkpoint_if_needed happens **after** the `step`th training update has completed,
         # so we pass in step + 1.
@@ -427,8 +566,10 @@ def train(cfg: DictConfig, out_dir: str | None = None, job_name: str | None = No
 
         step += 1
 
+    log_background_eval_if_done(step, wait=True)
     if eval_env:
         eval_env.close()
+    logger.finish()
     logging.info("End of training")
 
 
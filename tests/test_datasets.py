@@ -15,15 +15,19 @@
 # limitations under the License.
 import json
 import logging
+import shutil
 from copy import deepcopy
 from itertools import chain
 from pathlib import Path
 
 import einops
+import numpy as np
 import pytest
 import torch
 from datasets import Dataset
+from PIL import Image as PILImage
 from safetensors.torch import load_file
+from torchvision import transforms
 
 import lerobot
 from lerobot.common.datasets.compute_stats import (
@@ -37,10 +41,12 @@ from lerobot.common.datasets.utils import (
     flatten_dict,
     hf_transform_to_torch,
     load_previous_and_future_frames,
+    prefetch_to_cuda,
+    stage_to_local,
     unflatten_dict,
 )
 from lerobot.common.utils.utils import init_hydra_config, seeded_context
-from tests.utils import DEFAULT_CONFIG_PATH, DEVICE
+from tests.utils import DEFAULT_CONFIG_PATH, DEVICE, require_cuda
 
 
 @pytest.mark.parametrize(
@@ -272,6 +278,32 @@ def test_load_previous_and_future_frames_outside_tolerance_outside_episode_range
     ), "Padding does not match expected values"
 
 
+def test_hf_transform_to_torch():
+    rng = np.random.default_rng(0)
+    imgs = [PILImage.fromarray(rng.integers(0, 256, size=(8, 6, 3), dtype=np.uint8)) for _ in range(3)]
+    items_dict = {
+        "observation.image": list(imgs),
+        "observation.state": [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]],
+        "index": [0, 1, 2],
+        "ragged": [[1], [2, 3], [4]],
+    }
+    items_dict = hf_transform_to_torch(items_dict)
+
+    to_tensor = transforms.ToTensor()
+    for img, tensor in zip(imgs, items_dict["observation.image"], strict=True):
+        assert tensor.dtype == torch.float32
+        assert torch.equal(tensor, to_tensor(img))
+    for key, values in [
+        ("observation.state", [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]]),
+        ("index", [0, 1, 2]),
+        ("ragged", [[1], [2, 3], [4]]),
+    ]:
+        for value, tensor in zip(values, items_dict[key], strict=True):
+            expected = torch.tensor(value)
+            assert tensor.dtype == expected.dtype
+            assert torch.equal(tensor, expected)
+
+
 def test_flatten_unflatten_dict():
     d = {
         "obs": {
@@ -295,6 +327,67 @@ def test_flatten_unflatten_dict():
     assert json.dumps(original_d, sort_keys=True) == json.dumps(d, sort_keys=True), f"{original_d} != {d}"
 
 
+@require_cuda
+def test_prefetch_to_cuda():
+    batches = [{"index": torch.full((4,), i), "action": torch.rand(4, 2)} for i in range(3)]
+    device = torch.device("cuda")
+    prefetched = list(prefetch_to_cuda(batches, device))
+    assert len(prefetched) == len(batches)
+    for batch, cuda_batch in zip(batches, prefetched, strict=True):
+        assert set(cuda_batch) == set(batch)
+        for key in batch:
+            assert cuda_batch[key].device.type == "cuda"
+            assert torch.equal(cuda_batch[key].cpu(), batch[key])
+
+
+def test_stage_to_local(tmp_path):
+    root = tmp_path / "remote"
+    local_root = tmp_path / "local"
+    (root / "lerobot/pusht/train").mkdir(parents=True)
+    (root / "lerobot/pusht/train/data.arrow").write_text("data")
+    (root / "lerobot/pusht/train/state.json").write_text('{"_fingerprint": "a"}')
+
+    assert stage_to_local(["lerobot/pusht"], root, local_root) == local_root
+    assert (local_root / "lerobot/pusht/train/data.arrow").read_text() == "data"
+    # No temporary directory is left over.
+    assert list((local_root / "lerobot").iterdir()) == [local_root / "lerobot/pusht"]
+
+    # Datasets that were already staged are not copied again.
+    (root / "lerobot/pusht/train/data.arrow").write_text("new data")
+    stage_to_local(["lerobot/pusht"], root, local_root)
+    assert (local_root / "lerobot/pusht/train/data.arrow").read_text() == "data"
+
+    # Datasets whose fingerprint changed are copied again.
+    (root / "lerobot/pusht/train/state.json").write_text('{"_fingerprint": "b"}')
+    stage_to_local(["lerobot/pusht"], root, local_root)
+    assert (local_root / "lerobot/pusht/train/data.arrow").read_text() == "new data"
+    assert list((local_root / "lerobot").iterdir()) == [local_root / "lerobot/pusht"]
+
+
+def test_stage_to_local_concurrently_staged(tmp_path, monkeypatch):
+    """Check that a dataset staged by another run during the copy is kept, and counts as staged."""
+    root = tmp_path / "remote"
+    local_root = tmp_path / "local"
+    (root / "lerobot/pusht/train").mkdir(parents=True)
+    (root / "lerobot/pusht/train/state.json").write_text('{"_fingerprint": "a"}')
+
+    copytree = shutil.copytree
+
+    def copytree_while_other_run_stages(src, dst, *args, **kwargs):
+        # The other run completes its staging while this one is copying.
+        if not (local_root / "lerobot/pusht").exists():
+            monkeypatch.setattr(shutil, "copytree", copytree)
+            copytree(src, local_root / "lerobot/pusht")
+            (local_root / "lerobot/pusht/other_run").write_text("")
+        return copytree(src, dst, *args, **kwargs)
+
+    monkeypatch.setattr(shutil, "copytree", copytree_while_other_run_stages)
+    stage_to_local(["lerobot/pusht"], root, local_root)
+
+    assert (local_root / "lerobot/pusht/other_run").exists()
+    assert list((local_root / "lerobot").iterdir()) == [local_root / "lerobot/pusht"]
+
+
 @pytest.mark.parametrize(
     "repo_id",
     [
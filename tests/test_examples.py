@@ -60,7 +60,7 @@ def test_examples_basic2_basic3_advanced1():
         file_contents,
         [
             ("training_steps = 5000", "training_steps = 1"),
-            ("num_workers=4", "num_workers=0"),
+            ("num_workers = 4", "num_workers = 0"),
             ('device = torch.device("cuda")', 'device = torch.device("cpu")'),
             ("batch_size=64", "batch_size=1"),
         ],
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Copyright 2024 The HuggingFace Inc. team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import torch
+from huggingface_hub import PyTorchModelHubMixin
+from omegaconf import OmegaConf
+from torch import nn
+
+from lerobot.common.logger import Logger
+
+
+class _TinyPolicy(nn.Module, PyTorchModelHubMixin):
+    name = "tiny"
+
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(2, 1)
+
+
+def _optimizer_step(policy: _TinyPolicy, optimizer: torch.optim.Optimizer):
+    policy.linear(torch.rand(4, 2)).sum().backward()
+    optimizer.step()
+    optimizer.zero_grad(set_to_none=True)
+
+
+def test_save_checkpoint(tmp_path):
+    cfg = OmegaConf.create(
+        {
+            "policy": {"name": "tiny"},
+            "dataset_repo_id": "lerobot/pusht",
+            "env": {"name": "pusht"},
+            "seed": 1000,
+            "resume": False,
+        }
+    )
+    logger = Logger(cfg, tmp_path)
+    policy = _TinyPolicy()
+    optimizer = torch.optim.Adam(policy.parameters())
+
+    _optimizer_step(policy, optimizer)
+    logger.save_checkpont(1, policy, optimizer, None, identifier="000001")
+    first_state = {k: v.clone() for k, v in optimizer.state[policy.linear.weight].items()}
+    # Update the optimizer state in place while the checkpoint may still be being written.
+    _optimizer_step(policy, optimizer)
+    logger.save_checkpont(2, policy, optimizer, None, identifier="000002")
+    second_state = {k: v.clone() for k, v in optimizer.state[policy.linear.weight].items()}
+    logger.finish()
+
+    # The "last" link points to the second checkpoint, and was replaced atomically.
+    last_checkpoint_dir = logger.last_checkpoint_dir
+    assert last_checkpoint_dir.resolve() == (logger.checkpoints_dir / "000002").resolve()
+    assert not last_checkpoint_dir.with_name(last_checkpoint_dir.name + ".tmp").exists()
+    assert (logger.last_pretrained_model_dir / "config.yaml").exists()
+
+    # The first checkpoint holds the optimizer state at the time it was saved.
+    first_training_state = torch.load(logger.checkpoints_dir / "000001" / Logger.training_state_file_name)
+    assert first_training_state["step"] == 1
+    for key, value in first_state.items():
+        assert torch.equal(first_training_state["optimizer"]["state"][0][key], value)
+
+    # The last checkpoint restores the step and the optimizer state.
+    new_policy = _TinyPolicy()
+    new_optimizer = torch.optim.Adam(new_policy.parameters())
+    assert logger.load_last_training_state(new_optimizer, None) == 2
+    for key, value in second_state.items():
+        assert torch.equal(new_optimizer.state[new_policy.linear.weight][key], value)
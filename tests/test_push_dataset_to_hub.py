@@ -16,10 +16,18 @@ import pytest
 import torch
 
 from lerobot.common.datasets.lerobot_dataset import LeRobotDataset
+from lerobot.common.datasets.push_dataset_to_hub.pusht_zarr_format import (
+    PUSHT_GOAL_POS_ANGLE,
+    PUSHT_TEE_AREA,
+    PUSHT_TEE_CENTER_OF_GRAVITY,
+    PUSHT_TEE_VERTICES,
+    tee_intersection_area,
+    tee_local_to_world,
+)
 from lerobot.common.datasets.push_dataset_to_hub.utils import save_images_concurrently
 from lerobot.common.datasets.video_utils import encode_video_frames
 from lerobot.scripts.push_dataset_to_hub import push_dataset_to_hub
-from tests.utils import require_package_arg
+from tests.utils import require_package, require_package_arg
 
 
 def _mock_download_raw_pusht(raw_dir, num_frames=4, num_episodes=3):
@@ -300,6 +308,39 @@ def test_push_dataset_to_hub_format(required_packages, tmpdir, raw_format, repo_
         assert cam_key in item
 
 
+@require_package("gym_pusht")
+def test_pusht_tee_coverage_matches_gym_pusht():
+    """Check that the analytic coverage used to compute PushT rewards matches the one of the environment."""
+    import pymunk
+    from gym_pusht.envs.pusht import PushTEnv, pymunk_to_shapely
+
+    rng = np.random.default_rng(0)
+    block_pos = rng.uniform(100, 400, size=(64, 2)).astype(np.float32)
+    block_angle = rng.uniform(-np.pi, np.pi, size=(64,)).astype(np.float32)
+    # Place the block exactly on the goal to cover the full coverage case.
+    block_pos[0] = np.array([256, 256]) - np.array([45 * np.sin(np.pi / 4), 45 - 45 * np.cos(np.pi / 4)])
+    block_angle[0] = np.pi / 4
+
+    goal_vertices = tee_local_to_world(
+        PUSHT_GOAL_POS_ANGLE[None, :2], PUSHT_GOAL_POS_ANGLE[None, 2], PUSHT_TEE_VERTICES, np.zeros(2)
+    )[0]
+    block_vertices = tee_local_to_world(
+        block_pos, block_angle, PUSHT_TEE_VERTICES, PUSHT_TEE_CENTER_OF_GRAVITY
+    )
+    coverage = tee_intersection_area(block_vertices, goal_vertices) / PUSHT_TEE_AREA
+
+    goal_body = PushTEnv.get_goal_pose_body(PUSHT_GOAL_POS_ANGLE)
+    for i in range(len(block_pos)):
+        space = pymunk.Space()
+        block_body = PushTEnv.add_tee(space, block_pos[i].tolist(), block_angle[i].item())
+        goal_geom = pymunk_to_shapely(goal_body, block_body.shapes)
+        block_geom = pymunk_to_shapely(block_body, block_body.shapes)
+        expected_coverage = goal_geom.intersection(block_geom).area / goal_geom.area
+        assert np.isclose(goal_geom.area, PUSHT_TEE_AREA)
+        assert np.isclose(coverage[i], expected_coverage, rtol=0, atol=1e-9)
+    assert np.isclose(coverage[0], 1)
+
+
 @pytest.mark.parametrize(
     "raw_format, repo_id",
     [
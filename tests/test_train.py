@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Copyright 2024 The HuggingFace Inc. team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import torch
+from torch import nn
+from torch.cuda.amp import GradScaler
+
+from lerobot.scripts.train import update_policy
+
+
+class _LinearPolicy(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(3, 1)
+
+    def forward(self, batch):
+        return {"loss": ((self.linear(batch["x"]) - batch["y"]) ** 2).mean()}
+
+
+def _update(policy, dl_iter, grad_accumulation_steps):
+    optimizer = torch.optim.SGD(policy.parameters(), lr=0.1)
+    return update_policy(
+        policy,
+        dl_iter,
+        optimizer,
+        grad_clip_norm=1e6,
+        grad_scaler=GradScaler(enabled=False),
+        grad_accumulation_steps=grad_accumulation_steps,
+    )
+
+
+def test_update_policy_grad_accumulation():
+    """Check that accumulating over two half batches gives the same update as one step on the full batch."""
+    torch.manual_seed(0)
+    batch = {"x": torch.rand(8, 3), "y": torch.rand(8, 1)}
+    half_batches = [{k: v[:4] for k, v in batch.items()}, {k: v[4:] for k, v in batch.items()}]
+    extra_batch = {"x": torch.rand(4, 3), "y": torch.rand(4, 1)}
+
+    policy = _LinearPolicy()
+    accumulated_policy = _LinearPolicy()
+    accumulated_policy.load_state_dict(policy.state_dict())
+
+    info = _update(policy, iter([batch]), grad_accumulation_steps=1)
+    dl_iter = iter([*half_batches, extra_batch])
+    accumulated_info = _update(accumulated_policy, dl_iter, grad_accumulation_steps=2)
+
+    # Exactly `grad_accumulation_steps` batches were taken from the iterator.
+    assert next(dl_iter) is extra_batch
+    torch.testing.assert_close(accumulated_info["loss"], info["loss"])
+    for param, accumulated_param in zip(policy.parameters(), accumulated_policy.parameters(), strict=True):
+        torch.testing.assert_close(accumulated_param, param)